@@ -0,0 +1,85 @@
+"""
+Cache en memoria con expiración (TTL) y deduplicación de cálculos concurrentes.
+Pensado para respuestas de APIs externas que se consultan repetidamente con la misma clave.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+class TTLCache:
+    """
+    Cache clave -> valor donde cada entrada vence a los `ttl_seconds`.
+
+    Fundamento Teórico:
+    - TTL: Acota cuán desactualizado puede estar un valor servido desde memoria
+    - Deduplicación: Si varios hilos piden la misma clave a la vez, solo uno la calcula
+      y el resto espera y reutiliza el resultado
+    - Memoria acotada: Las entradas vencidas se purgan al insertar y nunca hay más de
+      `maxsize`; el lock por clave se descarta cuando nadie más la está esperando
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        # Todas las entradas tienen el mismo TTL: el orden de inserción es también el de vencimiento
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # clave -> [lock, hilos que lo usan]
+        self._key_locks: Dict[Hashable, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            return False, None
+        return True, value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        """Inserta `key` purgando antes las entradas vencidas y las que excedan `maxsize`."""
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            while self._entries:
+                oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at > now and len(self._entries) < self.maxsize:
+                    break
+                del self._entries[oldest_key]
+            self._entries[key] = (now + self.ttl_seconds, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Retorna el valor cacheado para `key` o lo calcula con `compute()`.
+        Los resultados None y las excepciones no se cachean.
+        """
+        found, value = self._lookup(key)
+        if found:
+            return value
+
+        with self._lock:
+            key_entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_entry[1] += 1
+
+        try:
+            with key_entry[0]:
+                # Otro hilo pudo haberlo calculado mientras esperábamos
+                found, value = self._lookup(key)
+                if found:
+                    return value
+                value = compute()
+                if value is not None:
+                    self._store(key, value)
+                return value
+        finally:
+            with self._lock:
+                key_entry[1] -= 1
+                if key_entry[1] == 0 and self._key_locks.get(key) is key_entry:
+                    del self._key_locks[key]
+
+    def clear(self) -> None:
+        """Descarta todas las entradas."""
+        with self._lock:
+            self._entries.clear()
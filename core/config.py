@@ -3,6 +3,7 @@ Configuración centralizada para el Steam Skin Scraper.
 Utiliza variables de entorno con valores por defecto seguros.
 """
 import os
+from types import SimpleNamespace
 from typing import Final
 from dotenv import load_dotenv
 
@@ -11,16 +12,21 @@ load_dotenv()
 # Database Configuration
 DATABASE_URL: Final[str] = os.getenv("DATABASE_URL", "sqlite:///database.db")
 DATABASE_ECHO: Final[bool] = os.getenv("DATABASE_ECHO", "False").lower() == "true"
+DATABASE_POOL_SIZE: Final[int] = int(os.getenv("DATABASE_POOL_SIZE", "10"))  # Ignorado en SQLite
+DATABASE_MAX_OVERFLOW: Final[int] = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))  # Ignorado en SQLite
+DATABASE_BATCH_SIZE: Final[int] = int(os.getenv("DATABASE_BATCH_SIZE", "1000"))  # Filas por INSERT en lote
 
 # Steam API Configuration  
 STEAM_APP_ID: Final[int] = int(os.getenv("STEAM_APP_ID", "730"))  # CS2/CS:GO
 STEAM_CURRENCY: Final[int] = int(os.getenv("STEAM_CURRENCY", "1"))  # USD
 STEAM_BASE_URL: Final[str] = "https://steamcommunity.com"
 STEAM_LIST_URL: Final[str] = "https://steamcommunity.com/market/search/render/"
+STEAM_LOGIN_SECURE: Final[str] = os.getenv("STEAM_LOGIN_SECURE", "")  # Cookie de login; habilita /market/pricehistory/
 
 # Rate Limiting Configuration - Configuración conservadora para evitar 429s
 MAX_REQUESTS_BEFORE_THROTTLE: Final[int] = int(os.getenv("MAX_REQUESTS_BEFORE_THROTTLE", "1"))
 THROTTLE_WAIT_MIN_SECONDS: Final[int] = int(os.getenv("THROTTLE_WAIT_MIN_SECONDS", "20"))  # 20 seconds entre requests
+RATE_LIMIT_BURST: Final[int] = int(os.getenv("RATE_LIMIT_BURST", str(MAX_REQUESTS_BEFORE_THROTTLE)))  # Requests acumulables tras una pausa
 REQUEST_TIMEOUT: Final[int] = int(os.getenv("REQUEST_TIMEOUT", "30"))  # seconds
 BACKOFF_BASE_SECONDS: Final[int] = int(os.getenv("BACKOFF_BASE_SECONDS", "30"))  # Backoff inicial más agresivo
 JITTER_PERCENTAGE: Final[float] = float(os.getenv("JITTER_PERCENTAGE", "0.3"))  # 30% jitter
@@ -28,6 +34,13 @@ JITTER_PERCENTAGE: Final[float] = float(os.getenv("JITTER_PERCENTAGE", "0.3"))
 # Scraping Configuration
 BATCH_SIZE: Final[int] = int(os.getenv("BATCH_SIZE", "10"))
 MAX_RETRIES: Final[int] = int(os.getenv("MAX_RETRIES", "3"))
+SCRAPER_MAX_WORKERS: Final[int] = int(os.getenv("SCRAPER_MAX_WORKERS", "1"))  # Páginas en paralelo
+SCRAPER_INFLIGHT_PAGES: Final[int] = int(os.getenv("SCRAPER_INFLIGHT_PAGES", "0"))  # Páginas pedidas a la vez; 0 = 2 * workers
+PRICE_CACHE_TTL_SECONDS: Final[int] = int(os.getenv("PRICE_CACHE_TTL_SECONDS", "60"))  # 0 desactiva el cache
+TOTAL_COUNT_TTL_SECONDS: Final[int] = int(os.getenv("TOTAL_COUNT_TTL_SECONDS", "86400"))  # 0 desactiva el cache en disco
+
+# Skinspock Configuration
+SKINSPOCK_CACHE_TTL_SECONDS: Final[int] = int(os.getenv("SKINSPOCK_CACHE_TTL_SECONDS", "3600"))  # 0 desactiva el cache HTTP en disco
 
 # Logging Configuration
 LOG_LEVEL: Final[str] = os.getenv("LOG_LEVEL", "INFO")
@@ -46,56 +59,63 @@ USER_AGENTS: Final[list] = [
 
 DEFAULT_USER_AGENT: Final[str] = os.getenv("USER_AGENT", USER_AGENTS[0])
 
-class Config:
-    """
-    Clase de configuración que valida y expone todas las configuraciones.
-    Implementa el patrón Singleton para garantizar una única instancia.
-    """
-    _instance = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._validate_config()
-        return cls._instance
-    
-    def _validate_config(self) -> None:
-        """Valida que la configuración sea correcta."""
-        if STEAM_APP_ID <= 0:
-            raise ValueError("STEAM_APP_ID debe ser un entero positivo")
-        if MAX_REQUESTS_BEFORE_THROTTLE <= 0:
-            raise ValueError("MAX_REQUESTS_BEFORE_THROTTLE debe ser positivo")
-        if BATCH_SIZE <= 0:
-            raise ValueError("BATCH_SIZE debe ser positivo")
-    
-    @property
-    def database_url(self) -> str:
-        return DATABASE_URL
-    
-    @property
-    def steam_config(self) -> dict:
-        return {
-            "app_id": STEAM_APP_ID,
-            "currency": STEAM_CURRENCY,
-            "base_url": STEAM_BASE_URL,
-            "timeout": REQUEST_TIMEOUT,
-            "user_agent": DEFAULT_USER_AGENT,
-            "list_url": STEAM_LIST_URL
-        }
-    
-    @property
-    def rate_limit_config(self) -> dict:
-        return {
-            "max_requests": MAX_REQUESTS_BEFORE_THROTTLE,
-            "wait_seconds": THROTTLE_WAIT_MIN_SECONDS,
-            "max_retries": MAX_RETRIES,
-            "backoff_base": BACKOFF_BASE_SECONDS,
-            "jitter_percentage": JITTER_PERCENTAGE
-        }
-    
-    @property
-    def user_agents(self) -> list:
-        return USER_AGENTS
+def _validate_config() -> None:
+    """Valida que la configuración sea correcta."""
+    if STEAM_APP_ID <= 0:
+        raise ValueError("STEAM_APP_ID debe ser un entero positivo")
+    if MAX_REQUESTS_BEFORE_THROTTLE <= 0:
+        raise ValueError("MAX_REQUESTS_BEFORE_THROTTLE debe ser positivo")
+    if RATE_LIMIT_BURST <= 0:
+        raise ValueError("RATE_LIMIT_BURST debe ser positivo")
+    if BATCH_SIZE <= 0:
+        raise ValueError("BATCH_SIZE debe ser positivo")
+    if SCRAPER_MAX_WORKERS <= 0:
+        raise ValueError("SCRAPER_MAX_WORKERS debe ser positivo")
+    if SKINSPOCK_CACHE_TTL_SECONDS < 0:
+        raise ValueError("SKINSPOCK_CACHE_TTL_SECONDS no puede ser negativo")
+    if SCRAPER_INFLIGHT_PAGES < 0:
+        raise ValueError("SCRAPER_INFLIGHT_PAGES no puede ser negativo")
+    if DATABASE_BATCH_SIZE <= 0:
+        raise ValueError("DATABASE_BATCH_SIZE debe ser positivo")
+    if LOG_LEVEL.upper() not in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+        raise ValueError("LOG_LEVEL debe ser DEBUG, INFO, WARNING, ERROR o CRITICAL")
+
+_validate_config()
 
-# Instancia global de configuración
-config = Config()
+# Instancia global de configuración: se construye una sola vez al importar el módulo
+config: Final[SimpleNamespace] = SimpleNamespace(
+    database_url=DATABASE_URL,
+    database_config={
+        "url": DATABASE_URL,
+        "echo": DATABASE_ECHO,
+        "pool_size": DATABASE_POOL_SIZE,
+        "max_overflow": DATABASE_MAX_OVERFLOW,
+        "batch_size": DATABASE_BATCH_SIZE
+    },
+    steam_config={
+        "app_id": STEAM_APP_ID,
+        "currency": STEAM_CURRENCY,
+        "base_url": STEAM_BASE_URL,
+        "timeout": REQUEST_TIMEOUT,
+        "user_agent": DEFAULT_USER_AGENT,
+        "list_url": STEAM_LIST_URL,
+        "max_workers": SCRAPER_MAX_WORKERS,
+        "inflight_pages": SCRAPER_INFLIGHT_PAGES,
+        "price_cache_ttl": PRICE_CACHE_TTL_SECONDS,
+        "total_count_ttl": TOTAL_COUNT_TTL_SECONDS,
+        "login_secure": STEAM_LOGIN_SECURE
+    },
+    rate_limit_config={
+        "max_requests": MAX_REQUESTS_BEFORE_THROTTLE,
+        "wait_seconds": THROTTLE_WAIT_MIN_SECONDS,
+        "burst": RATE_LIMIT_BURST,
+        "max_retries": MAX_RETRIES,
+        "backoff_base": BACKOFF_BASE_SECONDS,
+        "jitter_percentage": JITTER_PERCENTAGE,
+        "batch_size": BATCH_SIZE
+    },
+    skinspock_config={
+        "cache_ttl": SKINSPOCK_CACHE_TTL_SECONDS
+    },
+    user_agents=USER_AGENTS,
+)
@@ -1,20 +1,79 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
 
+from core.config import LOG_LEVEL
+
+# El formato no usa threadName/process/processName: se evita resolverlos en cada LogRecord
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 # Crear carpeta logs si no existe
 os.makedirs("logs", exist_ok=True)
 
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler que escribe a través de un buffer grande en lugar de vaciar
+    el archivo en cada registro. El buffer se vacía al rotar, al cerrar y ante
+    registros de nivel ERROR o superior.
+    El tamaño del archivo se lleva con un contador de caracteres: el `shouldRollover`
+    original hace seek/tell sobre el stream por cada registro, lo que vacía el buffer.
+    """
+    buffer_size = 1 << 16  # 64KB
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, encoding=self.encoding,
+                      errors=self.errors, buffering=self.buffer_size)
+        # Tamaño al abrir (0 tras rotar); de ahí en más se suma lo escrito por cada registro
+        self._size = stream.seek(0, 2)
+        self._record_size = 0
+        return stream
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        # Nunca rotar algo que no sea un archivo regular (bpo-45401)
+        if os.path.exists(self.baseFilename) and not os.path.isfile(self.baseFilename):
+            return False
+        if self.stream is None:  # delay=True
+            self.stream = self._open()
+        if self.maxBytes > 0:
+            self._record_size = len(self.format(record)) + len(self.terminator)
+            if self._size + self._record_size >= self.maxBytes:
+                return True
+        return False
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        self._size += self._record_size
+        if record.levelno >= logging.ERROR:
+            self.flush_buffer()
+
+    def flush(self) -> None:
+        # StreamHandler.emit llama a flush() por cada registro; se delega al buffer del archivo
+        pass
+
+    def flush_buffer(self) -> None:
+        """Fuerza la escritura del buffer a disco."""
+        self.acquire()
+        try:
+            if self.stream and hasattr(self.stream, "flush"):
+                self.stream.flush()
+        finally:
+            self.release()
+
 # Configuración del logger principal
 logger = logging.getLogger("steam_scraper")
-logger.setLevel(logging.DEBUG)  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+logger.setLevel(LOG_LEVEL.upper())  # LOG_LEVEL: DEBUG, INFO, WARNING, ERROR, CRITICAL
 
 # Handler de log general (info y debug)
-file_handler = RotatingFileHandler("logs/app.log", maxBytes=5_000_000, backupCount=5)
+file_handler = BufferedRotatingFileHandler("logs/app.log", maxBytes=5_000_000, backupCount=5)
 file_handler.setLevel(logging.INFO)
 
 # Handler de log de errores
-error_handler = RotatingFileHandler("logs/errors.log", maxBytes=5_000_000, backupCount=5)
+error_handler = BufferedRotatingFileHandler("logs/errors.log", maxBytes=5_000_000, backupCount=5)
 error_handler.setLevel(logging.ERROR)
 
 # Formato de los logs
@@ -27,7 +86,15 @@ console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.DEBUG)
 console_handler.setFormatter(formatter)
 
-# Añadir handlers al logger principal
-logger.addHandler(file_handler)
-logger.addHandler(error_handler)
-logger.addHandler(console_handler)
+# Los handlers reales corren en un hilo aparte: el hilo que loguea arma el mensaje
+# (QueueHandler.prepare lo formatea) y lo encola, sin escribir a disco ni rotar archivos.
+log_queue: queue.Queue = queue.Queue(-1)
+queue_handler = QueueHandler(log_queue)
+listener = QueueListener(
+    log_queue, file_handler, error_handler, console_handler, respect_handler_level=True
+)
+
+# Añadir el handler de cola al logger principal
+logger.addHandler(queue_handler)
+listener.start()
+atexit.register(listener.stop)
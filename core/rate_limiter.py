@@ -3,28 +3,36 @@ Sistema de Rate Limiting robusto para controlar requests a APIs externas.
 Implementa el patrón Token Bucket con backoff exponencial, rotación de User-Agents,
 headers realistas y detección inteligente de rate limits.
 """
+import math
 import time
 import random
-from typing import List, Optional
-from dataclasses import dataclass
+import itertools
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+from typing import Deque, Optional
 from core.loggin_config import logger
 from core.config import config
 
-@dataclass
-class RequestRecord:
-    """Registro de un request con timestamp y metadata de performance."""
-    timestamp: float
-    success: bool = True
-    response_time: Optional[float] = None
-    status_code: Optional[int] = None
+STATUS_WINDOW = 10  # Requests considerados en get_status
+DEGRADATION_WINDOW = 5  # Tiempos de respuesta considerados para detectar degradación
+SLOW_RESPONSE_SECONDS = 5.0
+RATE_PENALTY_SECONDS = 60  # Tras un 429 el ritmo de recarga se reduce a la mitad durante este tiempo
+
+ACCEPT_LANGUAGES = ('en-US,en;q=0.9', 'en-US,en;q=0.8,es;q=0.7', 'en-GB,en;q=0.9')
 
 class RateLimiter:
     """
-    Rate Limiter avanzado que implementa Sliding Window con backoff exponencial,
+    Rate Limiter avanzado que implementa Token Bucket con backoff exponencial,
     rotación de User-Agents, headers realistas y detección inteligente de rate limits.
     
     Fundamento Teórico:
-    - Sliding Window: Mantiene ventana deslizante de requests recientes
+    - Token Bucket: Se recargan `max_requests` tokens cada `window_seconds`, acumulando
+      hasta `burst` tokens, de modo que tras una pausa se puede despachar una ráfaga
+      sin superar el ritmo promedio
     - Backoff Exponencial: Aumenta tiempo de espera progresivamente
     - Jitter: Añade aleatoriedad para evitar thundering herd
     - Circuit Breaker: Detección automática de degradación del servicio
@@ -35,27 +43,83 @@ class RateLimiter:
         self, 
         max_requests: int = None,
         window_seconds: int = None,
-        max_retries: int = None 
+        max_retries: int = None,
+        burst: int = None
     ):
         rate_config = config.rate_limit_config
         self.max_requests = max_requests or rate_config["max_requests"]
         self.window_seconds = window_seconds or rate_config["wait_seconds"]
         self.max_retries = max_retries or rate_config["max_retries"]
+        self.burst = burst or rate_config["burst"]
         self.backoff_base = rate_config["backoff_base"]
         self.jitter_percentage = rate_config["jitter_percentage"]
         
-        self.requests: List[RequestRecord] = []
+        # Reloj monotónico: time.time() puede saltar (p.ej. ajustes NTP) y corromper la recarga.
+        # Todos los timestamps internos (incluidos session_start_time y last_429_time)
+        # son referencias de este reloj, no fechas.
+        self._now = time.monotonic
+        
+        # Estado del token bucket: arranca lleno para permitir la ráfaga inicial
+        # tokens por segundo; THROTTLE_WAIT_MIN_SECONDS=0 desactiva el throttling (ritmo ilimitado)
+        self.refill_rate = self.max_requests / self.window_seconds if self.window_seconds > 0 else math.inf
+        self._tokens = float(self.burst)
+        self._last_refill = self._now()
+        self._penalty_until = 0.0
         self.consecutive_failures = 0
-        self.current_user_agent_index = 0
-        self.session_start_time = time.time()
+        self._user_agent_cycle = itertools.cycle(tuple(config.user_agents))
+        self.session_start_time = self._now()
         self.degraded_service = False
         self.last_429_time = None
         
-    def _clean_old_requests(self) -> None:
-        """Elimina requests fuera de la ventana deslizante."""
-        current_time = time.time()
-        cutoff_time = current_time - self.window_seconds
-        self.requests = [req for req in self.requests if req.timestamp > cutoff_time]
+        # Métricas móviles actualizadas en record_request para consultas O(1)
+        self._recent_successes: Deque[bool] = deque(maxlen=STATUS_WINDOW)
+        self._success_count = 0
+        self._recent_response_times: Deque[float] = deque(maxlen=STATUS_WINDOW)
+        self._rt_sum = 0.0
+        self._degradation_times: Deque[float] = deque(maxlen=DEGRADATION_WINDOW)
+        self._degradation_rt_sum = 0.0
+        self._slow_count = 0
+        
+        # Generador propio para no pasar por el estado global de `random` en cada request
+        self._rng = random.Random()
+        self._uniform = self._rng.uniform
+        self._choice = self._rng.choice
+        self._random = self._rng.random
+        
+        # Thread-safety: la reserva de tokens se serializa con un lock que nunca se mantiene
+        # durante la espera; las métricas usan otro lock para que registrar un resultado
+        # no compita con la reserva de tokens.
+        self._bucket_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        
+        # Headers estáticos, construidos una sola vez
+        self._base_headers = MappingProxyType({
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+            'Accept-Encoding': DEFAULT_ACCEPT_ENCODING,  # Solo codificaciones que urllib3 puede descomprimir
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Sec-Fetch-User': '?1',
+            'Cache-Control': 'max-age=0',
+        })
+        
+    def _current_rate(self, now: float) -> float:
+        """Ritmo de recarga vigente: la mitad del configurado durante la penalización por 429."""
+        if now < self._penalty_until:
+            return self.refill_rate / 2
+        return self.refill_rate
+    
+    def _refill(self) -> None:
+        """Suma los tokens generados desde la última recarga, sin superar `burst`."""
+        now = self._now()
+        if self.refill_rate == math.inf:
+            # Sin throttling el bucket siempre está lleno (y se evita inf * 0 = nan)
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self._current_rate(now))
+        self._last_refill = now
     
     def _calculate_backoff(self, attempt: int) -> float:
         """
@@ -63,72 +127,105 @@ class RateLimiter:
         Formula: backoff_base * (2^attempt) + jitter
         """
         exponential_delay = self.backoff_base * (2 ** (attempt - 1))
-        jitter = random.uniform(0, self.jitter_percentage * exponential_delay)
+        jitter = self._uniform(0, self.jitter_percentage * exponential_delay)
         backoff_time = exponential_delay + jitter
         
         # Si hemos recibido 429 recientemente, ser más conservador
-        if self.last_429_time and (time.time() - self.last_429_time) < 300:  # 5 minutos
+        if self.last_429_time is not None and (self._now() - self.last_429_time) < 300:  # 5 minutos
             backoff_time *= 2
-            logger.warning(f"429 reciente detectado, duplicando backoff a {backoff_time:.1f}s")
+            logger.warning("429 reciente detectado, duplicando backoff a %.1fs", backoff_time)
         
         return min(backoff_time, 900)  # Max 15 minutos
         
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Interpreta el header Retry-After (segundos o fecha HTTP) como segundos a esperar.
+        Retorna None si no viene o no se puede interpretar.
+        """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    
     def _add_jitter_to_wait(self, base_wait: float) -> float:
         """Añade jitter aleatorio al tiempo de espera base."""
-        jitter = random.uniform(-self.jitter_percentage, self.jitter_percentage) * base_wait
+        jitter = self._uniform(-self.jitter_percentage, self.jitter_percentage) * base_wait
         return max(base_wait + jitter, 1.0)  # Mínimo 1 segundo
     
     def can_make_request(self) -> bool:
         """Verifica si se puede hacer un request sin violar límites."""
-        self._clean_old_requests()
-        return len(self.requests) < self.max_requests
+        with self._bucket_lock:
+            self._refill()
+            return self._tokens >= 1
     
     def wait_if_needed(self) -> None:
         """
-        Espera el tiempo necesario si se alcanzó el límite de requests.
+        Reserva el token del request que se va a despachar y espera, si hace falta,
+        hasta que ese token se haya recargado. Es seguro llamarlo desde varios hilos:
+        la reserva se hace con el lock tomado y la espera fuera de él, de modo que
+        `get_status` y `can_make_request` no quedan bloqueados durante el sueño.
         Implementa backoff exponencial, jitter y detección de degradación del servicio.
         """
-        self._clean_old_requests()
-        
-        if len(self.requests) >= self.max_requests:
-            # Calcular tiempo hasta que el request más antiguo expire
-            oldest_request = min(self.requests, key=lambda x: x.timestamp)
-            wait_time = (oldest_request.timestamp + self.window_seconds) - time.time()
-            
-            # Añadir jitter al tiempo base
-            wait_time = self._add_jitter_to_wait(wait_time)
+        wait_time = 0.0
+        with self._bucket_lock:
+            self._refill()
             
-            # Aplicar backoff si hay fallos consecutivos
-            if self.consecutive_failures > 0:
-                backoff_time = self._calculate_backoff(self.consecutive_failures)
-                wait_time = max(wait_time, backoff_time)
-                logger.warning(
-                    f"Rate limit + backoff: esperando {wait_time:.1f}s "
-                    f"(fallos consecutivos: {self.consecutive_failures})"
-                )
-            else:
-                logger.info(f"Rate limit: esperando {wait_time:.1f}s (con jitter)")
-            
-            # Detectar si el servicio está degradado
-            if self.consecutive_failures >= 3:
-                self.degraded_service = True
-                logger.error(f"Servicio Steam posiblemente degradado. Aumentando precauciones.")
+            if self._tokens < 1:
+                # Tiempo hasta que se recargue el token que falta. El saldo negativo que dejan
+                # las reservas de otros hilos alarga la espera, encolándolos en orden
+                wait_time = self._throttle_delay((1 - self._tokens) / self._current_rate(self._last_refill))
             
-            if wait_time > 0:
-                time.sleep(wait_time)
-                self._clean_old_requests()  # Limpiar después de esperar
+            # El jitter puede acortar la espera: el saldo negativo se descuenta del próximo request
+            self._tokens -= 1
+        
+        if wait_time > 0:
+            time.sleep(wait_time)
+    
+    def _throttle_delay(self, wait_time: float) -> float:
+        """
+        Aplica jitter y backoff al tiempo de espera base y retorna cuánto dormir.
+        """
+        # Añadir jitter al tiempo base
+        wait_time = self._add_jitter_to_wait(wait_time)
+        
+        # Aplicar backoff si hay fallos consecutivos
+        if self.consecutive_failures > 0:
+            backoff_time = self._calculate_backoff(self.consecutive_failures)
+            wait_time = max(wait_time, backoff_time)
+            logger.warning(
+                "Rate limit + backoff: esperando %.1fs (fallos consecutivos: %d)",
+                wait_time, self.consecutive_failures
+            )
+        else:
+            logger.info("Rate limit: esperando %.1fs (con jitter)", wait_time)
+        
+        # Detectar si el servicio está degradado
+        if self.consecutive_failures >= 3:
+            self.degraded_service = True
+            logger.error("Servicio Steam posiblemente degradado. Aumentando precauciones.")
+        
+        return wait_time
     
     def record_request(self, success: bool = True, response_time: Optional[float] = None, status_code: Optional[int] = None) -> None:
         """
-        Registra un request realizado con metadata completa y actualiza contadores.
+        Registra el resultado de un request (su token ya fue consumido en `wait_if_needed`)
+        y actualiza contadores.
         """
-        record = RequestRecord(
-            timestamp=time.time(),
-            success=success,
-            response_time=response_time,
-            status_code=status_code
-        )
-        self.requests.append(record)
+        with self._stats_lock:
+            self._register_outcome(success, response_time, status_code)
+    
+    def _register_outcome(self, success: bool, response_time: Optional[float], status_code: Optional[int]) -> None:
+        """Actualiza métricas y contadores de fallos a partir del resultado de un request."""
+        self._update_rolling_metrics(success, response_time)
         
         if success:
             self.consecutive_failures = 0
@@ -138,10 +235,34 @@ class RateLimiter:
         else:
             self.consecutive_failures += 1
             if status_code == 429:
-                self.last_429_time = time.time()
-                logger.error(f"Rate limited (429). Fallos consecutivos: {self.consecutive_failures}")
+                self.last_429_time = self._now()
+                self._penalty_until = self.last_429_time + RATE_PENALTY_SECONDS
+                logger.error("Rate limited (429). Fallos consecutivos: %d", self.consecutive_failures)
             else:
-                logger.warning(f"Request fallido (status: {status_code}). Fallos consecutivos: {self.consecutive_failures}")
+                logger.warning("Request fallido (status: %s). Fallos consecutivos: %d", status_code, self.consecutive_failures)
+    
+    def _update_rolling_metrics(self, success: bool, response_time: Optional[float]) -> None:
+        """Actualiza las sumas móviles descontando el valor que sale de cada ventana."""
+        if len(self._recent_successes) == self._recent_successes.maxlen:
+            self._success_count -= self._recent_successes[0]
+        self._recent_successes.append(success)
+        self._success_count += success
+        
+        if response_time is None:
+            return
+        
+        if len(self._recent_response_times) == self._recent_response_times.maxlen:
+            self._rt_sum -= self._recent_response_times[0]
+        self._recent_response_times.append(response_time)
+        self._rt_sum += response_time
+        
+        if len(self._degradation_times) == self._degradation_times.maxlen:
+            evicted = self._degradation_times[0]
+            self._degradation_rt_sum -= evicted
+            self._slow_count -= evicted > SLOW_RESPONSE_SECONDS
+        self._degradation_times.append(response_time)
+        self._degradation_rt_sum += response_time
+        self._slow_count += response_time > SLOW_RESPONSE_SECONDS
     
     def should_retry(self, attempt: int) -> bool:
         """Determina si se debe reintentar un request fallido."""
@@ -149,30 +270,19 @@ class RateLimiter:
     
     def get_next_user_agent(self) -> str:
         """Obtiene el siguiente User-Agent en rotación."""
-        user_agents = config.user_agents
-        self.current_user_agent_index = (self.current_user_agent_index + 1) % len(user_agents)
-        return user_agents[self.current_user_agent_index]
+        return next(self._user_agent_cycle)
     
     def get_realistic_headers(self) -> dict:
         """
         Genera headers realistas que simulan navegación humana.
+        Solo User-Agent, Accept-Language y Referer varían; el resto se copia de la base fija.
         """
-        headers = {
-            'User-Agent': self.get_next_user_agent(),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': random.choice(['en-US,en;q=0.9', 'en-US,en;q=0.8,es;q=0.7', 'en-GB,en;q=0.9']),
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Cache-Control': 'max-age=0',
-        }
+        headers = dict(self._base_headers)
+        headers['User-Agent'] = self.get_next_user_agent()
+        headers['Accept-Language'] = self._choice(ACCEPT_LANGUAGES)
         
         # Ocasionalmente añadir referer de Steam
-        if random.random() < 0.3:  # 30% del tiempo
+        if self._random() < 0.3:  # 30% del tiempo
             headers['Referer'] = 'https://steamcommunity.com/market/'
         
         return headers
@@ -181,44 +291,40 @@ class RateLimiter:
         """
         Detecta si el rendimiento del servicio se está degradando.
         """
-        if len(self.requests) < 3:
+        samples = len(self._degradation_times)
+        if samples < 3:
             return False
         
-        recent_requests = [r for r in self.requests if r.response_time is not None][-5:]
-        if len(recent_requests) < 3:
-            return False
-        
-        avg_response_time = sum(r.response_time for r in recent_requests) / len(recent_requests)
-        slow_requests = sum(1 for r in recent_requests if r.response_time > 5.0)
+        avg_response_time = self._degradation_rt_sum / samples
         
         # Si más del 60% de requests recientes son lentos (>5s), considerar degradado
-        return slow_requests / len(recent_requests) > 0.6 or avg_response_time > 8.0
+        return self._slow_count / samples > 0.6 or avg_response_time > 8.0
     
     def get_status(self) -> dict:
         """Retorna información completa del estado actual del rate limiter."""
-        self._clean_old_requests()
+        with self._bucket_lock:
+            self._refill()
+            tokens = self._tokens
         
-        # Calcular estadísticas de performance
+        # Estadísticas de performance sobre los últimos requests (sumas móviles)
         recent_success_rate = 0
         avg_response_time = 0
-        if self.requests:
-            recent_requests = self.requests[-10:]  # Últimos 10 requests
-            successful = sum(1 for r in recent_requests if r.success)
-            recent_success_rate = successful / len(recent_requests) * 100
-            
-            response_times = [r.response_time for r in recent_requests if r.response_time is not None]
-            if response_times:
-                avg_response_time = sum(response_times) / len(response_times)
+        if self._recent_successes:
+            recent_success_rate = self._success_count / len(self._recent_successes) * 100
+        if self._recent_response_times:
+            avg_response_time = self._rt_sum / len(self._recent_response_times)
         
         return {
-            "requests_in_window": len(self.requests),
+            "tokens": tokens,
+            "burst": self.burst,
             "max_requests": self.max_requests,
             "window_seconds": self.window_seconds,
+            "refill_rate": self._current_rate(self._now()),
             "consecutive_failures": self.consecutive_failures,
-            "can_make_request": self.can_make_request(),
+            "can_make_request": tokens >= 1,
             "degraded_service": self.degraded_service,
             "last_429_time": self.last_429_time,
-            "session_duration": time.time() - self.session_start_time,
+            "session_duration": self._now() - self.session_start_time,
             "recent_success_rate": recent_success_rate,
             "avg_response_time": avg_response_time,
             "performance_degraded": self._detect_performance_degradation()
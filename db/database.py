@@ -3,24 +3,73 @@ Module for managing and transforming data from the various Steam skin APIs...
 """
 import pandas as pd
 from contextlib import contextmanager
-from typing import Generator
-from sqlalchemy import create_engine
+from typing import Generator, Iterator
+from sqlalchemy import create_engine, delete, event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import Insert
 from sqlalchemy.orm import sessionmaker, Session
 from db.models import Base, Item, Price
-from sqlalchemy.exc import IntegrityError
 from core.config import config
 
+# Constructores de INSERT con soporte de ON CONFLICT por dialecto.
+# Los demás backends usan un SELECT previo para no duplicar hash_name.
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+# hash_name por consulta IN al filtrar duplicados sin ON CONFLICT
+EXISTING_LOOKUP_CHUNK = 500
+
 class DataBase:
     def __init__(self, appid: int = None) -> None:
         self.appid = appid or config.steam_config["app_id"]
-        self.engine = create_engine(
-            config.database_url, 
-            echo=False  # Controlado por configuración
-        )
+        self.engine = self._create_engine(config.database_url)
+        # expire_on_commit=False: los objetos devueltos siguen siendo legibles tras cerrar la sesión
         self.session_local = sessionmaker(
-            autocommit=False, autoflush=False, bind=self.engine)
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
         self.session = None
 
+        # Filas por lote al insertar con `bulk_insert_items` / `bulk_insert_prices`
+        self.batch_size = config.database_config["batch_size"]
+
+    @staticmethod
+    def _create_engine(url: str) -> Engine:
+        """
+        Crea el engine con opciones de pool acordes al backend.
+        En SQLite habilita WAL y synchronous=NORMAL para que los commits no hagan fsync cada vez.
+        """
+        db_config = config.database_config
+        if url.startswith("sqlite"):
+            engine = create_engine(
+                url,
+                echo=db_config["echo"],  # DATABASE_ECHO, apagado por defecto
+                connect_args={"check_same_thread": False},
+                pool_pre_ping=False,
+                insertmanyvalues_page_size=db_config["batch_size"],
+            )
+
+            @event.listens_for(engine, "connect")
+            def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.execute("PRAGMA temp_store=MEMORY")
+                cursor.execute("PRAGMA cache_size=-200000")  # ~200MB de page cache
+                cursor.close()
+
+            return engine
+
+        return create_engine(
+            url,
+            echo=db_config["echo"],  # DATABASE_ECHO, apagado por defecto
+            pool_pre_ping=False,
+            insertmanyvalues_page_size=db_config["batch_size"],
+            pool_size=db_config["pool_size"],
+            max_overflow=db_config["max_overflow"],
+        )
+
     def init_db(self) -> None:
         """
         Inicializa la base de datos y crea las tablas si no existen.
@@ -28,49 +77,55 @@ class DataBase:
         Base.metadata.create_all(bind=self.engine)
         self.session = self.session_local()
 
-    def add_item(self, hash_name: str, type_: str, classid: str, instanceid: str, imagehash: str, tradable: int, sell_price_text: str = "") -> Item:
+    def add_item(self, hash_name: str, type_: str, classid: str, instanceid: str, imagehash: str, tradable: int, sell_price_text: str = "", session: Session | None = None) -> Item:
         """
         Agrega un skin a la base de datos usando context manager para manejo seguro.
+        Si el skin ya existe se actualiza `tradable` y se retorna el registro existente,
+        todo en una única sentencia INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+        (SQLite / PostgreSQL; en otros backends, SELECT y luego INSERT o UPDATE).
+        Si se pasa `session` (ver `batch`), la operación se suma a esa transacción.
         """
-        with self.get_session() as session:
-            item = Item(
-                hash_name=hash_name,
-                type_=type_,
-                classid=classid,
-                instanceid=instanceid,
-                imagehash=imagehash,
-                tradable=tradable,
-            )
-            try:
-                session.add(item)
-                session.flush()  # Para obtener el ID sin commit completo
-                session.refresh(item)
-                return item
-            except IntegrityError:
-                # Si ya existe, buscar y retornar el existente
-                session.rollback()
-                return session.query(Item).filter_by(hash_name=hash_name).first()
+        values = {
+            "hash_name": hash_name,
+            "type_": type_,
+            "classid": classid,
+            "instanceid": instanceid,
+            "imagehash": imagehash,
+            "tradable": tradable,
+        }
+        with self._session_scope(session) as session:
+            if not self._supports_upsert():
+                return self._upsert_item_generic(session, values)
+            stmt = self._dialect_insert(Item).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["hash_name"],
+                set_={"tradable": stmt.excluded.tradable},
+            ).returning(Item)
+            return session.scalars(stmt, execution_options={"populate_existing": True}).one()
         
-    def delete_item(self, hash_name: str) -> bool:
+    def delete_item(self, hash_name: str, session: Session | None = None) -> bool:
         """       
         Elimina un skin de la base de datos usando context manager.
+        Un único DELETE por hash_name (indexado), sin cargar el objeto ORM.
+        Si se pasa `session` (ver `batch`), la operación se suma a esa transacción.
         """
-        with self.get_session() as session:
-            item = session.query(Item).filter_by(hash_name=hash_name).first()
-            if item:
-                session.delete(item)
-                return True
-            return False
+        with self._session_scope(session) as session:
+            result = session.execute(delete(Item).where(Item.hash_name == hash_name))
+            return result.rowcount > 0
 
-    def add_price(self, item_id: int, market: str, price: float) -> Price:
+    def add_price(self, item_id: int, market: str, price: float, session: Session | None = None, need_id: bool = False) -> Price:
         """
         Agrega un precio a la base de datos usando context manager.
+        Si se pasa `session` (ver `batch`), la operación se suma a esa transacción.
+        El INSERT se emite al hacer commit; con `need_id=True` se hace flush inmediato
+        para que `id` esté disponible dentro de la transacción en curso.
+        Para varios precios usar `bulk_insert_prices`, que los inserta con un único executemany.
         """
-        with self.get_session() as session:
+        with self._session_scope(session) as session:
             price_obj = Price(item_id=item_id, market=market, price=price)
             session.add(price_obj)
-            session.flush()
-            session.refresh(price_obj)
+            if need_id:
+                session.flush()
             return price_obj
 
     def get_item(self, hash_name: str) -> Item | None:
@@ -78,38 +133,118 @@ class DataBase:
         Obtiene un item específico por su hash_name.
         """
         with self.get_session() as session:
-            return session.query(Item).filter_by(hash_name=hash_name).first()
+            return session.scalars(select(Item).filter_by(hash_name=hash_name)).first()
 
     def get_items(self) -> list[Item]:
         """
         Obtiene todos los items de la base de datos usando context manager.
+        Materializa la tabla completa; para tablas grandes preferir `iter_items` o `items_df`.
+        """
+        with self.get_session() as session:
+            return list(session.scalars(select(Item)))
+
+    def iter_items(self, chunk_size: int = 1000) -> Iterator[Item]:
+        """
+        Itera los items en bloques de `chunk_size` filas (yield_per),
+        manteniendo acotado el uso de memoria. En PostgreSQL yield_per usa un cursor
+        de servidor, por lo que las filas tampoco se acumulan en el driver.
         """
         with self.get_session() as session:
-            return session.query(Item).all()
+            yield from session.execute(select(Item)).yield_per(chunk_size).scalars()
 
-    def bulk_insert_items(self, items: list[Item]) -> int:
+    def items_df(self) -> pd.DataFrame:
         """
-        Inserta múltiples items en la base de datos usando context manager.
+        Devuelve los items como DataFrame leyendo las filas directamente,
+        sin hidratar objetos ORM.
+        """
+        with self.engine.connect() as connection:
+            return pd.read_sql_query(select(Item.__table__), connection)
+
+    def bulk_insert_items(self, items: list[dict], session: Session | None = None) -> int:
+        """
+        Inserta múltiples items (diccionarios con las columnas de `Item`) usando executemany.
+        Los hash_name ya existentes se ignoran.
+        Si se pasa `session` (ver `batch`), la operación se suma a esa transacción.
         Retorna el número de items insertados.
         """
         if not items:
             return 0
             
-        with self.get_session() as session:
-            session.bulk_save_objects(items)
-            return len(items)
+        with self._session_scope(session) as session:
+            if not self._supports_upsert():
+                items = self._new_items_only(session, items)
+                if not items:
+                    return 0
+            result = session.execute(self._insert_ignore(Item.__table__), items)
+            return result.rowcount
 
-    def bulk_insert_prices(self, prices: list[Price]) -> int:
+    def bulk_insert_prices(self, prices: list[dict], session: Session | None = None) -> int:
         """
-        Inserta múltiples precios en la base de datos usando context manager.
+        Inserta múltiples precios (diccionarios con las columnas de `Price`) usando executemany.
+        Si se pasa `session` (ver `batch`), la operación se suma a esa transacción.
         Retorna el número de precios insertados.
         """
         if not prices:
             return 0
             
-        with self.get_session() as session:
-            session.bulk_save_objects(prices)
-            return len(prices)
+        with self._session_scope(session) as session:
+            result = session.execute(insert(Price.__table__), prices)
+            return result.rowcount
+
+    def _supports_upsert(self) -> bool:
+        """Indica si el backend soporta INSERT ... ON CONFLICT."""
+        return self.engine.dialect.name in UPSERT_INSERTS
+
+    def _dialect_insert(self, table) -> Insert:
+        """
+        Retorna el INSERT específico del backend, que soporta ON CONFLICT (SQLite / PostgreSQL).
+        """
+        dialect = self.engine.dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise NotImplementedError(f"Upsert no soportado para el dialecto '{dialect}'")
+        return UPSERT_INSERTS[dialect](table)
+
+    def _insert_ignore(self, table) -> Insert:
+        """
+        Construye un INSERT que ignora filas duplicadas en `hash_name`
+        usando el upsert nativo del backend (SQLite / PostgreSQL).
+        En otros backends es un INSERT simple: las filas deben venir filtradas
+        con `_new_items_only`.
+        """
+        if not self._supports_upsert():
+            return insert(table)
+        return self._dialect_insert(table).on_conflict_do_nothing(index_elements=["hash_name"])
+
+    @staticmethod
+    def _upsert_item_generic(session: Session, values: dict) -> Item:
+        """
+        Upsert de `add_item` para backends sin ON CONFLICT: busca el skin por
+        hash_name y lo actualiza, o lo inserta si no existe.
+        """
+        item = session.scalars(select(Item).filter_by(hash_name=values["hash_name"])).first()
+        if item is None:
+            item = Item(**values)
+            session.add(item)
+        else:
+            item.tradable = values["tradable"]
+        session.flush()
+        return item
+
+    @staticmethod
+    def _new_items_only(session: Session, items: list[dict]) -> list[dict]:
+        """
+        Descarta los items cuyo hash_name ya existe en la tabla o se repite en el lote,
+        para backends sin ON CONFLICT DO NOTHING.
+        """
+        rows: dict[str, dict] = {}
+        for row in items:
+            rows.setdefault(row["hash_name"], row)
+        names = list(rows)
+        for offset in range(0, len(names), EXISTING_LOOKUP_CHUNK):
+            chunk = names[offset:offset + EXISTING_LOOKUP_CHUNK]
+            for existing in session.scalars(select(Item.hash_name).where(Item.hash_name.in_(chunk))):
+                rows.pop(existing, None)
+        return list(rows.values())
 
     @contextmanager
     def get_session(self) -> Generator[Session, None, None]:
@@ -127,6 +262,32 @@ class DataBase:
         finally:
             session.close()
 
+    @contextmanager
+    def batch(self) -> Generator[Session, None, None]:
+        """
+        Abre una única transacción para agrupar varias operaciones:
+
+            with db.batch() as session:
+                for skin in skins:
+                    db.add_item(..., session=session)
+
+        Hace commit al salir (o rollback si hay error) y cierra la sesión una sola vez.
+        """
+        with self.get_session() as session:
+            yield session
+
+    @contextmanager
+    def _session_scope(self, session: Session | None) -> Generator[Session, None, None]:
+        """
+        Reutiliza la sesión recibida sin hacer commit ni cerrarla,
+        o abre una sesión propia con `get_session` si no se recibe ninguna.
+        """
+        if session is not None:
+            yield session
+            return
+        with self.get_session() as own_session:
+            yield own_session
+
     def close(self) -> None:
         """
         Cierra la sesión de la base de datos.
@@ -2,7 +2,7 @@
 Module for modeling the database schema for Steam skins and prices.
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
@@ -22,6 +22,9 @@ class Item(Base):
 
 class Price(Base):
     __tablename__ = "prices"
+    # Índice para consultar el último precio de un item en un mercado sin recorrer la tabla
+    __table_args__ = (Index("ix_prices_item_market_time", "item_id", "market", "updated_at"),)
+
     id = Column(Integer, primary_key=True)
     item_id = Column(Integer, ForeignKey("items.id"))
     market = Column(String)  # Ej: "Steam", "Buff", "Skinport"
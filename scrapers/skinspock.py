@@ -1,8 +1,75 @@
 import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+from requests.packages.urllib3.util.retry import Retry
+import orjson
 import os
+import logging
+from collections import OrderedDict
+from functools import cache, cached_property
 
 import pandas as pd
-import json
+import xlsxwriter
+from requests_cache import CachedSession
+
+from core.config import config
+from core.loggin_config import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+SRC_DIR = os.path.join(BASE_DIR, "src")
+
+# Inventarios recordados para consultas condicionales cuando el cache HTTP está desactivado
+INVENTORY_VALIDATORS_MAXSIZE = 32
+
+
+@cache
+def _get_session() -> requests.Session:
+    """
+    Sesión compartida por todos los clientes: las conexiones keep-alive se reutilizan
+    en todo el proceso en lugar de abrir un pool nuevo por instancia. Se crea recién
+    en la primera consulta, no al importar el módulo.
+    Las respuestas GET se guardan en data/.http_cache.sqlite durante SKINSPOCK_CACHE_TTL_SECONDS,
+    de modo que consultar el mismo inventario varias veces no vuelve a pegarle a la API.
+    """
+    if config.skinspock_config["cache_ttl"] > 0:
+        session = CachedSession(
+            os.path.join(DATA_DIR, ".http_cache"),
+            backend="sqlite",
+            expire_after=config.skinspock_config["cache_ttl"],
+            allowable_methods=("GET",),
+            # El header de la API key se redacta del cache en disco y no forma parte de la clave
+            ignored_parameters=["Apikeys"],
+        )
+    else:
+        session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    ))
+    return session
+
+
+@cache
+def _load_apikey() -> str:
+    """Lee data/apikey.txt una sola vez por proceso."""
+    with open(os.path.join(DATA_DIR, "apikey.txt"), "r") as file:
+        return file.read().strip()
+
+
+def _none_if_na(value):
+    """Convierte los valores faltantes de pandas (NA, NaN, NaT) en None; el resto no cambia."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _write_as_text(worksheet, row, col, value, cell_format=None):
+    """Write handler de xlsxwriter para tipos que Excel no soporta."""
+    return worksheet.write_string(row, col, str(value), cell_format)
 
 
 class SkinspockAPI:
@@ -19,24 +86,25 @@ class SkinspockAPI:
         Attributes:
             steamid (str): The Steam ID of the user.
             __base_url (str): The base URL for the Skinpock API.
-            __session (requests.Session): A session object for making HTTP requests.
             params (dict): Parameters for the API request, including Steam ID, sorting options, game, and language.
-            headers (dict): Headers for the API request, including Accept, User-Agent, Referer, Accept-Language, and API keys.
+
+        The API key, the HTTP session and the request headers are resolved lazily
+        on first use (see `apikey`, `_session` and `headers`).
         """
         
-        self.BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.DATA_DIR = os.path.join(self.BASE_DIR, "data")
-        self.SRC_DIR = os.path.join(self.BASE_DIR, "src")
-
-        # Load API key from a file
-        apikey_path = os.path.join(self.DATA_DIR, "apikey.txt")
-        with open(apikey_path, "r") as file:
-            self.apikey = file.read().strip()
+        self.BASE_DIR = BASE_DIR
+        self.DATA_DIR = DATA_DIR
+        self.SRC_DIR = SRC_DIR
 
         self.steamid = steamid
         self.__base_url_inventory = "https://www.skinpock.com/api/inventory"
-        self.__session = requests.Session()
         self.data = None
+        # ETag / Last-Modified y el último inventario recibido, por steamid, para repetir
+        # la consulta de forma condicional (304 = sin cambios). Solo sin cache HTTP:
+        # CachedSession ya guarda los validadores y revalida las respuestas vencidas.
+        self._inventory_validators: "OrderedDict[str, tuple[str | None, str | None, list]] | None" = (
+            OrderedDict() if config.skinspock_config["cache_ttl"] == 0 else None
+        )
 
         self.bloat_columns = [
             "markethashname",
@@ -58,15 +126,30 @@ class SkinspockAPI:
             "game":      "cs2",
             "language":  "english"
         }
-        self.headers = {# type: ignore
+
+    @cached_property
+    def apikey(self) -> str:
+        """API key leída de data/apikey.txt (cacheada por proceso)."""
+        return _load_apikey()
+
+    @cached_property
+    def _session(self) -> requests.Session:
+        """Sesión HTTP compartida, creada en la primera consulta."""
+        return _get_session()
+
+    @cached_property
+    def headers(self) -> dict:
+        """Headers for the API request, including Accept, User-Agent, Referer, Accept-Language, and API keys."""
+        return {
             "Accept":          "application/json, text/plain, */*",
             "User-Agent":      "Mozilla/5.0 (Windows NT 10.0; Win64; x64) " \
                             "AppleWebKit/537.36 (KHTML, like Gecko) " \
                             "Chrome/135.0.0.0 Safari/537.36",
             "Referer":         f"https://www.skinpock.com/es/inventory/{self.steamid}",
             "Accept-Language": "es-ES,es;q=0.9",
+            "Accept-Encoding": DEFAULT_ACCEPT_ENCODING,
             "Apikeys":  self.apikey
-        } 
+        }
 
     def get_inventory(self, steamid: str = "") -> list[str]:
         """
@@ -79,14 +162,40 @@ class SkinspockAPI:
             self.steamid = steamid
             self.params["steam_id"] = steamid
 
+        headers = self.headers
+        validators = self._inventory_validators
+        cached = validators.get(self.steamid) if validators is not None else None
+        if cached:
+            etag, last_modified, _ = cached
+            headers = dict(self.headers)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
         try:
-            response = self.__session.get(self.__base_url_inventory, params=self.params, headers=self.headers)
+            response = self._session.get(self.__base_url_inventory, params=self.params, headers=headers)
+            if response.status_code == 304 and cached:
+                # Inventario sin cambios: no se descarga ni se decodifica de nuevo
+                return cached[2]
             response.raise_for_status()  # Raise an error for bad responses
-            data = response.json()
+            data = orjson.loads(response.content)
+            if validators is None:
+                return data
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                validators[self.steamid] = (etag, last_modified, data)
+                validators.move_to_end(self.steamid)
+                if len(validators) > INVENTORY_VALIDATORS_MAXSIZE:
+                    validators.popitem(last=False)
             return data
         
         except requests.exceptions.RequestException as e:
-            print("Error:", e)
+            logger.error("Error obteniendo inventario de %s: %s", self.steamid, e)
+            return None
+        except orjson.JSONDecodeError as e:
+            logger.error("Error decodificando JSON del inventario de %s: %s", self.steamid, e)
             return None
         
 
@@ -104,32 +213,79 @@ class DataInventory:
         self.data = self.skinspock.get_inventory()
         self.bloat_columns = self.skinspock.get_bloat_columns()
 
-        # Convert list to string and then to JSON, then to DataFrame
-        self.data = json.dumps(self.data)
-        self.data = json.loads(self.data)
-        self.df = pd.DataFrame(self.data)
+        # get_inventory already returns the parsed JSON payload (list of dicts).
+        # Project only the wanted columns at construction so pandas never
+        # allocates the bloat ones and the row dicts are not copied.
+        self.data = self.data or []
+        bloat = set(self.bloat_columns)
+        keep = [key for key in dict.fromkeys(key for row in self.data for key in row) if key not in bloat]
+        # Arrow-backed dtypes: strings and nullable numbers stored columnar instead of as Python objects
+        self.df = pd.DataFrame(self.data, columns=keep).convert_dtypes(dtype_backend="pyarrow")
+        self.downcast_columns()
 
         self.price_date_name = "priceupdatedat"
 
+    def downcast_columns(self) -> None:
+        """
+        Reduce el tamaño del DataFrame: las columnas de texto con pocos valores
+        distintos (juego, rareza, exterior...) pasan a categóricas.
+        Los precios se mantienen en double para no alterar los valores exportados.
+        """
+        for column in self.df.columns:
+            series = self.df[column]
+            if pd.api.types.is_string_dtype(series) and series.nunique() < len(series) / 2:
+                self.df[column] = series.astype("category")
+
     def export_to_excel(self, filepath: str = "data.xlsx") -> None:
         """
         Exporta los datos a un archivo Excel en la ruta especificada.
+        Usa xlsxwriter en modo constant_memory: cada fila se escribe a disco
+        al pasar a la siguiente, en lugar de mantener la hoja entera en memoria.
+        Las filas se escriben en orden (pandas escribe por columnas, lo que
+        es incompatible con constant_memory).
+        """
+        workbook = xlsxwriter.Workbook(filepath, {"constant_memory": True})
+        try:
+            sheet = workbook.add_worksheet()
+            # Valores anidados (listas/dicts de la API) se escriben como texto
+            sheet.add_write_handler(list, _write_as_text)
+            sheet.add_write_handler(dict, _write_as_text)
+            sheet.write_row(0, 0, list(self.df.columns))
+            # Los NA se pasan a None fila por fila, sin copiar el DataFrame entero a object
+            for row_number, row in enumerate(self.df.itertuples(index=False, name=None), start=1):
+                sheet.write_row(row_number, 0, [_none_if_na(value) for value in row])
+        finally:
+            workbook.close()
+
+    def export_to_csv(self, filepath: str = "data.csv") -> None:
+        """
+        Exporta los datos a CSV. Mucho más rápido que Excel cuando no se necesitan
+        funciones propias de la planilla.
+        """
+        self.df.to_csv(filepath, index=False)
+
+    def export_to_parquet(self, filepath: str = "data.parquet") -> None:
+        """
+        Exporta los datos a un archivo Parquet (columnar, comprimido con zstd).
+        Requiere pyarrow.
         """
-        self.df.to_excel(filepath, index=False)
+        self.df.to_parquet(filepath, engine="pyarrow", compression="zstd", index=False)
 
 
     def delete_bloat_columns(self) -> None:
         """
         Elimina columnas innecesarias del DataFrame.
+        Las columnas ya se filtran al construirlo; se mantiene por si el DataFrame se reemplaza.
         """
-        self.df.drop(columns=self.bloat_columns, inplace=True, errors='ignore')
+        self.df = self.df.drop(columns=self.bloat_columns, errors='ignore')
 
     def transform_data(self) -> None:
         """
         Realiza transformaciones adicionales en los datos.
         """
-        self.delete_bloat_columns()
-        print(self.df[self.price_date_name])  # type: ignore
+        # Formatear la columna completa es costoso: solo si el nivel DEBUG está activo
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s:\n%s", self.price_date_name, self.df[self.price_date_name])
 
     def show_data(self) -> None:
         """
@@ -140,6 +296,7 @@ class DataInventory:
 
     def to_excel(self) -> None:
         """
+        Exporta los datos a data/skinspock.xlsx.
         """
-        self.df.to_excel(r"../data/skinspock.xlsx", index=False)
+        self.export_to_excel(os.path.join(self.skinspock.DATA_DIR, "skinspock.xlsx"))
 
@@ -1,13 +1,19 @@
 import requests
-import json
+import orjson
 import re
 import time
 import sys
+import logging
 import os
 import random
-from typing import Optional, Dict, Any, List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import count as count_from, islice
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
 from urllib.parse import quote
 from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
 from requests.packages.urllib3.util.retry import Retry
 
 # Add parent directory to path to import core modules
@@ -16,6 +22,27 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.loggin_config import logger
 from core.config import config
 from core.rate_limiter import RateLimiter
+from core.cache import TTLCache
+
+# El historial viene embebido en el HTML del listing como `var line1=[...];`.
+# Se busca directamente sobre los bytes de la respuesta para no decodificar toda la página.
+_LINE1_RE = re.compile(rb'var line1=(\[.*?\]);', re.S)
+_LINE1_PREFIX = b'var line1='
+_LINE1_END = b'];'
+HISTORY_CHUNK_SIZE = 16384
+
+
+# total_count del listado persistido entre ejecuciones, por appid
+TOTALS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "steam_totals.json")
+
+
+@lru_cache(maxsize=8192)
+def _quote_hash(market_hash_name: str) -> str:
+    """
+    Codifica el hash_name como segmento de la URL del listing; cada skin se codifica una sola vez.
+    safe='' también escapa '/', que de otro modo partiría el path.
+    """
+    return quote(market_hash_name, safe='')
 
 
 class SteamAPIMarket:
@@ -35,6 +62,14 @@ class SteamAPIMarket:
         self.base_price_url = f"{steam_config['base_url']}/market/priceoverview/"
         self.base_history_url = f"{steam_config['base_url']}/market/pricehistory/"
         self.base_history_url_alt = f"{steam_config['base_url']}/market/listings/"
+        self.max_workers = steam_config["max_workers"]
+        # Ventana de páginas en vuelo: nunca menor que la cantidad de workers
+        self.inflight_pages = max(steam_config["inflight_pages"] or 2 * self.max_workers, self.max_workers)
+        # Valores de configuración usados en cada request/página, resueltos una sola vez
+        self.list_url = steam_config["list_url"]
+        self.timeout = steam_config["timeout"]
+        self.page_size = config.rate_limit_config.get("batch_size", 10)
+        self.login_secure = steam_config["login_secure"]
         
         # Setup session requests with retry strategy
         self.session = self._create_session(user_agent or steam_config["user_agent"])
@@ -42,6 +77,11 @@ class SteamAPIMarket:
         # Initialize rate limiter
         self.rate_limiter = RateLimiter()
         
+        # Cache de precios: evita repetir requests por el mismo item dentro del TTL
+        self.price_cache_ttl = steam_config["price_cache_ttl"]
+        self._price_cache = TTLCache(self.price_cache_ttl)
+        self.total_count_ttl = steam_config["total_count_ttl"]
+        
     def _create_session(self, user_agent: str) -> requests.Session:
         """
         Crea una sesión con retry strategy, timeouts y cookies realistas.
@@ -62,7 +102,12 @@ class SteamAPIMarket:
             allowed_methods=["HEAD", "GET", "OPTIONS"]
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Pool dimensionado para que cada worker de paginación tenga su conexión keep-alive
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=max(32, self.max_workers),
+            max_retries=retry_strategy
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
@@ -71,7 +116,7 @@ class SteamAPIMarket:
             'User-Agent': user_agent,
             'Accept': 'application/json, text/html, */*',
             'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': DEFAULT_ACCEPT_ENCODING,  # Incluye br solo si brotli está instalado
             'Connection': 'keep-alive',
         })
         
@@ -83,9 +128,12 @@ class SteamAPIMarket:
             'Steam_Language': 'english',
             'timezoneOffset': '0,0'
         })
+        if self.login_secure:
+            # El endpoint JSON de historial solo responde a sesiones logueadas
+            session.cookies.set('steamLoginSecure', self.login_secure, domain='steamcommunity.com')
         
         # Timeout por defecto
-        session.timeout = config.steam_config["timeout"]
+        session.timeout = self.timeout
         
         return session
 
@@ -96,20 +144,48 @@ class SteamAPIMarket:
         :param market_hash_name: Encoded item name, e.g. "AK-47 | Redline (Field-Tested)"
         :return: Dictionary with keys: success, lowest_price, median_price, volume
         """
+        return self._cached(
+            ("overview", market_hash_name, self.currency),
+            lambda: self._fetch_price_overview(market_hash_name)
+        )
+
+    def get_price_overviews(self, market_hash_names: List[str]) -> Dict[str, Optional[dict]]:
+        """
+        Gets the price overview of several items, `max_workers` requests at a time
+        over the session's keep-alive pool (paced by the shared rate limiter).
+
+        :param market_hash_names: Item names
+        :return: Dictionary name -> overview, or None if that item failed
+        """
+        def fetch(market_hash_name: str) -> Optional[dict]:
+            try:
+                return self.get_price_overview(market_hash_name)
+            except ValueError as e:
+                logger.error("%s", e)
+                return None
+
+        names = list(dict.fromkeys(market_hash_names))  # sin duplicados, en orden
+        if self.max_workers == 1 or len(names) <= 1:
+            return {name: fetch(name) for name in names}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(names, executor.map(fetch, names)))
+
+    def _fetch_price_overview(self, market_hash_name: str) -> dict:
         params = {
             'appid': self.appid,
             'currency': self.currency,
             'market_hash_name': market_hash_name
         }
 
-        resp = self.session.get(self.base_price_url, params=params)
+        # Mismo camino que el listado: sesión con conexiones keep-alive, rate limiting y reintentos
+        resp = self._make_request_with_rate_limit(self.base_price_url, params)
+        if resp is None:
+            raise ValueError(f"No se pudo obtener precio overview para '{market_hash_name}'")
         
         try:
-            data = resp.json()
-        except json.JSONDecodeError:
+            data = orjson.loads(resp.content)
+        except orjson.JSONDecodeError:
             raise ValueError(f"Error al decodificar JSON para '{market_hash_name}': {resp.text}")
-        except ValueError:
-            raise ValueError(f"Respuesta inesperada al obtener precio overview para '{market_hash_name}': {resp.text}")
         
         if not data.get('success', False):
             raise ValueError(f"Error al obtener precio overview para '{market_hash_name}'")
@@ -125,39 +201,127 @@ class SteamAPIMarket:
         Test URL:
         https://steamcommunity.com/market/pricehistory/?appid=730&market_hash_name=AK-47%20|%20Redline%20(Field-Tested)
         """
+        return self._cached(
+            ("history", market_hash_name, self.currency),
+            lambda: self._fetch_price_history(market_hash_name)
+        )
+
+    def _fetch_price_history(self, market_hash_name: str):
+        # Con cookie de login se usa el endpoint JSON (~KB) en lugar de la página HTML del listing
+        if self.login_secure:
+            return self._fetch_price_history_json(market_hash_name)
+
         params = {
             'appid': self.appid,
             'market_hash_name': market_hash_name
         }
-        url = f"{self.base_history_url_alt}{self.appid}/{quote(params['market_hash_name'])}"
-        # Generamos la request a la URL de historial de precios
-        resp = requests.get(url)
+        url = f"{self.base_history_url_alt}{self.appid}/{_quote_hash(params['market_hash_name'])}"
+        # Generamos la request a la URL de historial de precios, reutilizando las conexiones de la sesión
+        resp = self._make_request_with_rate_limit(url, stream=True)
 
-        if resp.status_code == 200:
-            match = re.search(r'var line1=(\[.*?\]);', resp.text, re.S)
-            print(f"match: {match}")
+        if resp is not None:
+            try:
+                match = self._scan_line1(resp)
+            except requests.exceptions.RequestException as e:
+                logger.error("Error leyendo el HTML de historial de '%s': %s", market_hash_name, e)
+                return None
 
             # Convert matched JSON string to Python object
             if match:
                 raw_json = match.group(1)  # Contenido del array
-                price_history = json.loads(raw_json)
-                print(f"Se encontraron {len(price_history)} puntos de historial")
-                print(price_history[:5])  # Muestra los primeros 5
+                try:
+                    price_history = orjson.loads(raw_json)
+                except orjson.JSONDecodeError as e:
+                    logger.error("Error decodificando historial de '%s': %s", market_hash_name, e)
+                    return None
+                logger.debug("Se encontraron %d puntos de historial para '%s'", len(price_history), market_hash_name)
                 return price_history
             else:
-                print("No se encontró el historial en el HTML")
+                logger.debug("No se encontró el historial en el HTML de '%s'", market_hash_name)
                 return None
         else:
-            print(f"Error al obtener historial de precios para '{market_hash_name}': {resp.status_code}")          
+            logger.error("Error al obtener historial de precios para '%s'", market_hash_name)
             return None
 
+    @staticmethod
+    def _scan_line1(resp: requests.Response) -> Optional[re.Match]:
+        """
+        Lee el HTML del listing por bloques y deja de acumular en cuanto aparece
+        `var line1=[...];`. Cada bloque se revisa una sola vez: primero se busca el
+        prefijo y luego el cierre `];`, y solo entonces se aplica la regex sobre el buffer.
+        El resto de la página se descarta sin guardarlo, para que la conexión vuelva al pool.
+        """
+        buffer = bytearray()
+        start = -1
+        scanned = 0
+        chunks = resp.iter_content(chunk_size=HISTORY_CHUNK_SIZE)
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                if start < 0:
+                    # Retroceder lo justo para encontrar un prefijo partido entre dos bloques
+                    start = buffer.find(_LINE1_PREFIX, max(0, scanned - len(_LINE1_PREFIX) + 1))
+                    if start < 0:
+                        scanned = len(buffer)
+                        continue
+                    scanned = start
+                if buffer.find(_LINE1_END, max(start, scanned - 1)) >= 0:
+                    return _LINE1_RE.match(buffer, start)
+                scanned = len(buffer)
+            return None
+        finally:
+            # Cerrar sin leer el resto descartaría la conexión keep-alive.
+            # Si el drenado falla, solo se cierra: no debe pisar un resultado ya obtenido.
+            try:
+                for _ in chunks:
+                    pass
+            except requests.exceptions.RequestException:
+                pass
+            finally:
+                resp.close()
+
+    def _fetch_price_history_json(self, market_hash_name: str):
+        """
+        Obtiene el historial desde /market/pricehistory/, que devuelve directamente
+        `{"success": true, "prices": [[fecha, precio, volumen], ...]}`.
+        """
+        params = {
+            'appid': self.appid,
+            'currency': self.currency,
+            'market_hash_name': market_hash_name
+        }
+        resp = self._make_request_with_rate_limit(self.base_history_url, params)
+        if resp is None:
+            logger.error("Error al obtener historial de precios para '%s'", market_hash_name)
+            return None
+
+        try:
+            data = orjson.loads(resp.content)
+        except orjson.JSONDecodeError as e:
+            logger.error("Error decodificando JSON de historial para '%s': %s", market_hash_name, e)
+            return None
+
+        if not data or not data.get('success', False):
+            logger.error("Historial no disponible para '%s'", market_hash_name)
+            return None
+        return data.get('prices', [])
+
+    def _cached(self, key: tuple, fetch):
+        """
+        Sirve `key` desde el cache de precios o ejecuta `fetch`. Requests simultáneos
+        por la misma clave comparten una única llamada a Steam.
+        """
+        if self.price_cache_ttl <= 0:
+            return fetch()
+        return self._price_cache.get_or_compute(key, fetch)
+
     def get_max_items(self) -> int:  
         """
         Obtiene el número total de items disponibles usando el rate limiter mejorado.
         """
-        url = "https://steamcommunity.com/market/search/render/"    
+        url = self.list_url
         params = {
-            "appid": 730,
+            "appid": self.appid,
             "count": 1,
             "start": 0,
             "norender": 1,
@@ -172,15 +336,60 @@ class SteamAPIMarket:
             return 0
             
         try:
-            data = response.json()
+            data = orjson.loads(response.content)
             total_count = data.get("total_count", 0)
-            logger.info(f"Total items disponibles en Steam Market: {total_count}")
+            logger.info("Total items disponibles en Steam Market: %s", total_count)
             return total_count
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decodificando JSON: {e}")
+        except orjson.JSONDecodeError as e:
+            logger.error("Error decodificando JSON: %s", e)
             return 0
     
-    def _make_request_with_rate_limit(self, url: str, params: dict = {}) -> Optional[requests.Response]:
+    def get_cached_max_items(self) -> int:
+        """
+        Igual que `get_max_items`, pero reutiliza el total guardado en data/steam_totals.json
+        si tiene menos de `total_count_ttl` segundos, ahorrando el request previo al scraping.
+        """
+        return self._cached_max_items()[0]
+
+    def _cached_max_items(self) -> Tuple[int, bool]:
+        """
+        Implementación de `get_cached_max_items`. Retorna además si el total salió
+        del archivo de cache: en ese caso puede estar desactualizado y solo sirve como estimación.
+        """
+        if self.total_count_ttl <= 0:
+            return self.get_max_items(), False
+
+        key = str(self.appid)
+        try:
+            with open(TOTALS_PATH, "rb") as file:
+                totals = orjson.loads(file.read())
+        except (OSError, orjson.JSONDecodeError):
+            totals = {}
+        # Un archivo con otra forma (editado a mano, versión vieja) se descarta y se reescribe
+        if not isinstance(totals, dict):
+            totals = {}
+
+        cached = totals.get(key)
+        valid = (
+            isinstance(cached, dict)
+            and isinstance(cached.get("total_count"), int)
+            and isinstance(cached.get("fetched_at"), (int, float))
+        )
+        if valid and time.time() - cached["fetched_at"] < self.total_count_ttl:
+            logger.info("Usando total de items cacheado: %s", cached["total_count"])
+            return cached["total_count"], True
+
+        total_count = self.get_max_items()
+        if total_count:
+            totals[key] = {"total_count": total_count, "fetched_at": time.time()}
+            try:
+                with open(TOTALS_PATH, "wb") as file:
+                    file.write(orjson.dumps(totals))
+            except OSError as e:
+                logger.warning("No se pudo guardar el total de items en %s: %s", TOTALS_PATH, e)
+        return total_count, False
+
+    def _make_request_with_rate_limit(self, url: str, params: dict = {}, stream: bool = False) -> Optional[requests.Response]:
         """
         Hace un request respetando rate limits con headers realistas y manejo avanzado.
         
@@ -193,20 +402,22 @@ class SteamAPIMarket:
         
         attempt = 0
         while attempt <= self.rate_limiter.max_retries:
+            retry_after = None
             try:
                 # Verificar rate limit antes del request
                 self.rate_limiter.wait_if_needed()
                 
-                # Actualizar headers realistas para cada request
+                # Headers realistas por request (sin mutar la sesión compartida entre hilos)
                 realistic_headers = self.rate_limiter.get_realistic_headers()
-                self.session.headers.update(realistic_headers)
                 
-                logger.debug(f"Request attempt {attempt + 1} to {url}")
-                logger.debug(f"Using User-Agent: {realistic_headers.get('User-Agent', 'N/A')[:50]}...")
+                logger.debug("Request attempt %d to %s", attempt + 1, url)
+                logger.debug("Using User-Agent: %.50s...", realistic_headers.get('User-Agent', 'N/A'))
                 
                 # Medir tiempo de respuesta
                 start_time = time.time()
-                response = self.session.get(url, params=params)
+                response = self.session.get(
+                    url, params=params, headers=realistic_headers, timeout=self.timeout, stream=stream
+                )
                 response_time = time.time() - start_time
                 
                 # Verificar status code y registrar con metadata completa
@@ -216,118 +427,201 @@ class SteamAPIMarket:
                         response_time=response_time, 
                         status_code=200
                     )
-                    logger.debug(f"Request exitoso en {response_time:.2f}s")
+                    logger.debug("Request exitoso en %.2fs", response_time)
                     return response
                 elif response.status_code == 429:  # Rate limited
-                    logger.warning(f"Rate limited by Steam (429). Attempt {attempt + 1}")
+                    logger.warning("Rate limited by Steam (429). Attempt %d", attempt + 1)
+                    retry_after = self.rate_limiter.parse_retry_after(response.headers.get("Retry-After"))
                     self.rate_limiter.record_request(
                         success=False, 
                         response_time=response_time, 
                         status_code=429
                     )
+                    # Devolver la conexión al pool antes de reintentar (clave con stream=True)
+                    response.close()
                 elif response.status_code in [500, 502, 503, 504]:  # Server errors
-                    logger.warning(f"Server error {response.status_code}. Attempt {attempt + 1}")
+                    logger.warning("Server error %d. Attempt %d", response.status_code, attempt + 1)
+                    retry_after = self.rate_limiter.parse_retry_after(response.headers.get("Retry-After"))
                     self.rate_limiter.record_request(
                         success=False, 
                         response_time=response_time, 
                         status_code=response.status_code
                     )
+                    response.close()
                 else:
-                    logger.error(f"Unexpected status code {response.status_code}: {response.text[:200]}")
+                    logger.error("Unexpected status code %d: %.200s", response.status_code, response.text)
                     self.rate_limiter.record_request(
                         success=False, 
                         response_time=response_time, 
                         status_code=response.status_code
                     )
+                    response.close()
                     return None
                     
             except requests.exceptions.RequestException as e:
-                logger.error(f"Request exception on attempt {attempt + 1}: {e}")
+                logger.error("Request exception on attempt %d: %s", attempt + 1, e)
                 self.rate_limiter.record_request(success=False, status_code=None)
             
             attempt += 1
             if attempt <= self.rate_limiter.max_retries:
                 backoff_time = self.rate_limiter._calculate_backoff(attempt)
-                logger.info(f"Retrying in {backoff_time:.1f}s...")
+                # Si el servidor indica cuándo reintentar, no volver antes de ese momento
+                if retry_after is not None:
+                    backoff_time = max(backoff_time, min(retry_after, 900))
+                logger.info("Retrying in %.1fs...", backoff_time)
                 time.sleep(backoff_time)
         
-        logger.error(f"Failed to get response after {self.rate_limiter.max_retries} attempts")
+        logger.error("Failed to get response after %d attempts", self.rate_limiter.max_retries)
         return None
 
-    def get_list_items(self, start: int = 0, query: str = "") -> List[Dict[str, Any]]:
+    def _fetch_page(self, url: str, current_start: int, count: int, total_items: int, query: str) -> Optional[List[Dict[str, Any]]]:
         """
-        Gets a list of items from the Steam Market API with robust error handling.
+        Obtiene una página de resultados del listado.
+        Retorna None si la página falló o vino vacía, lo que corta la paginación.
+        """
+        logger.info("Obteniendo items %d-%d de %d", current_start, current_start + count, total_items)
+        
+        params = {
+            "appid": self.appid,
+            "count": count,
+            "start": current_start,
+            "norender": 1,
+            "query": query
+        }
+        
+        # Usar nuestro método con rate limiting
+        response = self._make_request_with_rate_limit(url, params)
+        
+        if not response:
+            logger.error("No se pudo obtener respuesta para start=%d", current_start)
+            return None
+
+        try:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError as e:
+            logger.error("Error decodificando JSON: %s", e)
+            return None
+            
+        results = data.get("results", [])
+        if not results:
+            logger.warning("No hay más resultados disponibles en start=%d", current_start)
+            return None
+            
+        # Log de progreso: una sola línea por página, armada solo si DEBUG está activo
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Items obtenidos: %s", [item.get('hash_name', 'N/A') for item in results])
+            
+        return results
+
+    def _fetch_pages_concurrently(self, url: str, offsets: Iterable[int], count: int, total_items: int, query: str):
+        """
+        Descarga las páginas con un pool de hilos y las entrega en orden de offset.
+        El rate limiter es compartido y thread-safe, por lo que el paralelismo solo
+        solapa la latencia de red dentro de los límites configurados.
+        Solo hay `inflight_pages` páginas pedidas a la vez (por defecto `2 * max_workers`):
+        al consumir una se pide la siguiente, en lugar de encolar todo el listado de entrada.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending_offsets = iter(offsets)
+        in_flight = deque(
+            executor.submit(self._fetch_page, url, current_start, count, total_items, query)
+            for current_start in islice(pending_offsets, self.inflight_pages)
+        )
+        try:
+            while in_flight:
+                results = in_flight.popleft().result()
+                if results is None:
+                    yield results
+                    return
+                next_start = next(pending_offsets, None)
+                if next_start is not None:
+                    in_flight.append(
+                        executor.submit(self._fetch_page, url, next_start, count, total_items, query)
+                    )
+                yield results
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_list_pages(self, start: int = 0, query: str = "", total_items: Optional[int] = None,
+                        total_is_hint: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorre el listado del Steam Market entregando una página de resultados por vez,
+        para que el consumidor procese cada página sin acumular el listado completo en memoria.
+        Si el total viene del cache (`total_is_hint`), se sigue paginando más allá de él
+        hasta recibir una página incompleta o vacía, por si el listado creció desde entonces.
         
         Fundamento Teórico:
         - Paginación: Obtiene datos en chunks manejables
         - Rate Limiting: Respeta límites de API para evitar bloqueos
         - Resilencia: Maneja fallos temporales y recupera automáticamente
         """
-        url = f"{config.steam_config['list_url']}"
-        count = config.rate_limit_config.get("batch_size", 10)
-        all_items = []
+        url = self.list_url
+        count = self.page_size
         
         # Obtener total de items disponibles
-        total_items = self.get_max_items()
+        if total_items is None:
+            total_items, total_is_hint = self._cached_max_items()
         if total_items == 0:
             logger.error("No se pudo obtener el total de items disponibles")
-            return []
+            return
             
-        logger.info(f"Iniciando scraping. Total items disponibles: {total_items}")
-        current_start = start
+        logger.info("Iniciando scraping. Total items disponibles: %d", total_items)
+        # El total cacheado puede haber quedado corto: la paginación la corta la primera página incompleta
+        offsets = count_from(start, count) if total_is_hint else range(start, total_items, count)
 
-        while current_start < total_items:
-            logger.info(f"Obteniendo items {current_start}-{current_start + count} de {total_items}")
-            
-            params = {
-                "appid": self.appid,
-                "count": count,
-                "start": current_start,
-                "norender": 1,
-                "query": query
-            }
-            
-            # Usar nuestro método con rate limiting
-            response = self._make_request_with_rate_limit(url, params)
-            
-            if not response:
-                logger.error(f"No se pudo obtener respuesta para start={current_start}")
-                break
+        if self.max_workers > 1:
+            pages = self._fetch_pages_concurrently(url, offsets, count, total_items, query)
+        else:
+            pages = (self._fetch_page(url, current_start, count, total_items, query) for current_start in offsets)
 
-            try:
-                data = response.json()
-            except json.JSONDecodeError as e:
-                logger.error(f"Error decodificando JSON: {e}")
+        for batch_number, results in enumerate(pages, start=1):
+            if results is None:
                 break
                 
-            results = data.get("results", [])
-            if not results:
-                logger.warning(f"No hay más resultados disponibles en start={current_start}")
+            yield results
+
+            # Una página incompleta es la última: total_count puede sobreestimar el listado
+            if len(results) < count:
+                logger.info("Página incompleta en el batch %d, fin del listado", batch_number)
                 break
-                
-            # Log de progreso
-            for item in results:
-                logger.debug(f"Item obtenido: {item.get('hash_name', 'N/A')}")
-                
-            all_items.extend(results)
-            current_start += count
             
             # Status detallado del rate limiter cada ciertos requests
-            if current_start % (count * 5) == 0:  # Cada 5 batches
+            if batch_number % 5 == 0:  # Cada 5 batches
                 status = self.rate_limiter.get_status()
-                logger.info(f"Rate limiter status - Success rate: {status['recent_success_rate']:.1f}%, "
-                          f"Avg response time: {status['avg_response_time']:.2f}s, "
-                          f"Degraded: {status['degraded_service']}")
+                logger.info("Rate limiter status - Success rate: %.1f%%, Avg response time: %.2fs, Degraded: %s",
+                            status['recent_success_rate'], status['avg_response_time'], status['degraded_service'])
                 
                 if status['performance_degraded']:
                     logger.warning("Performance degradada detectada. Considerando pausas más largas.")
 
-        logger.info(f"Scraping completado. Items obtenidos: {len(all_items)}")
-        
         # Status final
         final_status = self.rate_limiter.get_status()
-        logger.info(f"Estadísticas finales - Duración sesión: {final_status['session_duration']:.0f}s, "
-                   f"Success rate: {final_status['recent_success_rate']:.1f}%")
+        logger.info("Estadísticas finales - Duración sesión: %.0fs, Success rate: %.1f%%",
+                    final_status['session_duration'], final_status['recent_success_rate'])
+
+    def get_list_items(self, start: int = 0, query: str = "") -> List[Dict[str, Any]]:
+        """
+        Gets a list of items from the Steam Market API with robust error handling.
+        Materializa todas las páginas de `iter_list_pages`; para procesar el listado
+        en streaming usar directamente `iter_list_pages`.
+        """
+        total_items, total_is_hint = self._cached_max_items()
+        if total_items == 0:
+            logger.error("No se pudo obtener el total de items disponibles")
+            return []
+
+        # Lista preasignada al total esperado: cada página se copia en su posición
+        # sin realocar; al final se recortan los huecos si el listado vino más corto
+        # (o la lista crece si el listado superó al total cacheado)
+        all_items: List[Optional[Dict[str, Any]]] = [None] * max(total_items - start, 0)
+        filled = 0
+
+        for results in self.iter_list_pages(start, query, total_items, total_is_hint):
+            all_items[filled:filled + len(results)] = results
+            filled += len(results)
+
+        del all_items[filled:]
+        logger.info("Scraping completado. Items obtenidos: %d", len(all_items))
         
         return all_items
         
@@ -335,8 +629,14 @@ if __name__ == '__main__':
     # Usage of Steam Market API to get price overview and history
     client = SteamAPIMarket(currency=1)
 
-    import pandas as pd
-    df = pd.DataFrame(client.get_list_items())
-    df.to_csv("steam_market_items.csv", index=False)
+    # Escribe cada página al CSV a medida que llega, sin construir un DataFrame
+    import csv
+    with open("steam_market_items.csv", "w", newline="", encoding="utf-8") as file:
+        writer = None
+        for page in client.iter_list_pages():
+            if writer is None:
+                writer = csv.DictWriter(file, fieldnames=list(page[0]), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerows(page)
 
 
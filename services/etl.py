@@ -1,8 +1,26 @@
+import queue
+import threading
+from typing import Iterator
+
 from db.database import DataBase
-from db.models import Item, Price
 from scrapers.steam import SteamAPIMarket
 from core.loggin_config import logger
 
+# Pages buffered between the scraping thread and the DB inserts
+PAGE_QUEUE_SIZE = 4
+
+def _item_row(item: dict) -> dict:
+    """Converts a Steam listing result into a row of the items table."""
+    asset = item["asset_description"]
+    return {
+        "hash_name": item["hash_name"],
+        "type_": asset["type"],
+        "classid": asset["classid"],
+        "instanceid": asset["instanceid"],
+        "imagehash": asset["icon_url"],
+        "tradable": asset["tradable"]
+    }
+
 class ETLManager:
     def __init__(self, db: DataBase):
 
@@ -18,23 +36,62 @@ class ETLManager:
         pass
 
     def insert_items(self):
-        # Obtain items in db 
-        current_items = [item.hash_name for item in self.db.get_items()]
-        # Obtain items from Steam API
-        steam_items = self.steam_scraper.get_list_items()
-        # Filter new items that are not in the current items
-        new = [item for item in steam_items if item["hash_name"] not in current_items]
-        # Convert new items to Item model
-        new_items = [Item(
-            hash_name=item["hash_name"],
-            type_=item["asset_description"]["type"],
-            classid=item["asset_description"]["classid"],
-            instanceid=item["asset_description"]["instanceid"],
-            imagehash=item["asset_description"]["icon_url"],
-            tradable=item["asset_description"]["tradable"]
-        ) for item in new]
-        self.db.bulk_insert_items(new_items)
-        n = len(new_items)
+        # Stream pages from the Steam API and insert them in chunks of `batch_size` rows,
+        # so memory is bounded by one chunk instead of the whole listing
+        batch_size = self.db.batch_size
+        pending = []
+        n = 0
+        for page in self._pages_in_background():
+            # Items already in the db are skipped by the insert itself (ON CONFLICT DO NOTHING)
+            pending.extend(_item_row(item) for item in page)
+            if len(pending) >= batch_size:
+                n += self._insert_rows(pending)
+                pending = []
+        n += self._insert_rows(pending)
         logger.info(f"Inserted {n} new items into the database.")
         return n
 
+    def _pages_in_background(self) -> Iterator[list[dict]]:
+        """
+        Runs the Steam pagination in a separate thread and yields its pages,
+        so inserting one page overlaps with fetching the next ones.
+        The bounded queue keeps at most PAGE_QUEUE_SIZE pages in memory.
+        """
+        pages: queue.Queue = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+        stop = threading.Event()
+        errors: list[BaseException] = []
+
+        def produce() -> None:
+            try:
+                for page in self.steam_scraper.iter_list_pages():
+                    if stop.is_set():
+                        break
+                    pages.put(page)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                pages.put(None)
+
+        producer = threading.Thread(target=produce, name="steam-pages", daemon=True)
+        producer.start()
+        try:
+            yield from iter(pages.get, None)
+        finally:
+            # If the consumer stopped early, unblock the producer and wait for it to finish
+            stop.set()
+            while producer.is_alive() or not pages.empty():
+                try:
+                    if pages.get(timeout=0.1) is None:
+                        break
+                except queue.Empty:
+                    pass
+            producer.join()
+        if errors:
+            raise errors[0]
+
+    def _insert_rows(self, rows: list[dict]) -> int:
+        if not rows:
+            return 0
+        # One transaction (and fsync) per chunk
+        with self.db.batch() as session:
+            return self.db.bulk_insert_items(rows, session=session)